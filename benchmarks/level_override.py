@@ -0,0 +1,74 @@
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+"""Cost of a disabled ``debug()`` call with and without scoped level overrides.
+
+`python benchmarks/level_override.py -n 1000000`
+"""
+
+import os
+import timeit
+import logging
+import argparse
+import threading
+
+from nagare import log
+
+
+def measure(logger, number, repeat):
+    return min(timeit.repeat(lambda: logger.debug('Request %d', 42), number=number, repeat=repeat)) / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-n', '--number', type=int, default=1000000, help='Number of calls per measure')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Number of measures')
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as stream:
+        handler = logging.StreamHandler(stream)
+        handler.setLevel(logging.INFO)
+
+        logger = logging.getLogger('nagare.application.benchmark')
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        measure(logger, args.number, 1)  # Warm-up
+        print('{:<48} {:>8.1f} ns'.format('unmarked, no override active', measure(logger, args.number, args.repeat)))
+
+        # An override active in another thread (i.e an other request)
+        started, stop = threading.Event(), threading.Event()
+
+        def marked_request():
+            with log.override_level():
+                started.set()
+                stop.wait()
+
+        thread = threading.Thread(target=marked_request)
+        thread.start()
+        started.wait()
+
+        print(
+            '{:<48} {:>8.1f} ns'.format(
+                'unmarked, override active elsewhere', measure(logger, args.number, args.repeat)
+            )
+        )
+
+        stop.set()
+        thread.join()
+
+        with log.override_level():
+            print('{:<48} {:>8.1f} ns'.format('marked (record emitted)', measure(logger, args.number, args.repeat)))
+
+        print('{:<48} {:>8.1f} ns'.format('unmarked, after the overrides', measure(logger, args.number, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+"""Throughput of a stream handler shared by a growing number of threads.
+
+Compare a plain ``logging.StreamHandler`` with the same handler wrapped into a
+``ThreadBufferedHandler``, both writing to a real file (flushed by the plain
+handler after each record), taking the best of ``--repeat`` runs:
+
+  `python benchmarks/threads_scaling.py -n 20000 -t 1 2 4 8 16 32`
+
+The emitting threads still share the interpreter lock so the throughput can't
+grow with the threads, and even drops on a few cores. The ``format only``
+column, a handler formatting the records without any lock nor I/O, is the
+ceiling: the buffered handler is expected to follow it, the plain handler
+to fall away from it when the threads are added.
+"""
+
+import time
+import logging
+import argparse
+import tempfile
+import threading
+
+from nagare.services.handlers import ThreadBufferedHandler
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class FormatOnlyHandler(logging.Handler):
+    def handle(self, record):
+        self.format(record)
+
+    def emit(self, record):
+        pass
+
+
+def run(handler, nb_threads, nb_records):
+    logger = logging.getLogger('benchmark')
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    start = threading.Barrier(nb_threads + 1)
+
+    def log():
+        start.wait()
+        for i in range(nb_records):
+            logger.info('Request %d handled in %.3fs by %s', i, 0.012, 'worker')
+
+    threads = [threading.Thread(target=log) for _ in range(nb_threads)]
+    for thread in threads:
+        thread.start()
+
+    start.wait()
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    handler.close()
+
+    return nb_threads * nb_records / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-n', '--records', type=int, default=20000, help='Number of records logged by each thread')
+    parser.add_argument('-t', '--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('-b', '--batch-size', type=int, default=64)
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Number of runs of each measure')
+    args = parser.parse_args()
+
+    def format_only():
+        handler = FormatOnlyHandler()
+        handler.setFormatter(logging.Formatter(FORMAT))
+
+        return handler
+
+    def plain():
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(FORMAT))
+
+        return handler
+
+    def buffered():
+        handler = ThreadBufferedHandler(logging.StreamHandler(stream), args.batch_size)
+        handler.setFormatter(logging.Formatter(FORMAT))
+
+        return handler
+
+    print('{:>8} {:>20} {:>16} {:>16}'.format('threads', 'format only (rec/s)', 'plain (rec/s)', 'buffered (rec/s)'))
+
+    with tempfile.TemporaryFile('w') as stream:
+        for nb_threads in args.threads:
+            results = [
+                max(run(create_handler(), nb_threads, args.records) for _ in range(args.repeat))
+                for create_handler in (format_only, plain, buffered)
+            ]
+            print('{:>8} {:>20.0f} {:>16.0f} {:>16.0f}'.format(nb_threads, *results))
+
+
+if __name__ == '__main__':
+    main()
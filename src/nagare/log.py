@@ -8,9 +8,23 @@
 # --
 
 import logging
+import threading
+import contextlib
+import contextvars
 
 logger_name = None
 
+CONTEXT_DEFAULT = '-'
+context = {}
+
+level_override = contextvars.ContextVar('nagare.log.level_override', default=None)
+nb_level_overrides = 0
+level_overrides_lock = threading.Lock()
+
+_is_enabled_for = logging.Logger.isEnabledFor
+_call_handlers = logging.Logger.callHandlers
+_logger_make_record = logging.Logger.makeRecord
+
 
 def set_logger(name):
     global logger_name
@@ -18,6 +32,139 @@ def set_logger(name):
     logger_name = name
 
 
+class ContextRecordFactory(object):
+    """Log records factory setting the contextual fields on all the records.
+
+    The records received from elsewhere (``logging.makeLogRecord()``, socket
+    servers) then have the contextual fields, which their own values overwrite.
+    """
+
+    def __init__(self, factory, fields):
+        self.factory = factory
+        self.fields = tuple(fields)
+
+    def __call__(self, *args, **kw):
+        record = self.factory(*args, **kw)
+        for name, value in self.fields:
+            setattr(record, name, value.get())
+
+        return record
+
+
+def _make_record(self, name, level, fn, lno, msg, args, exc_info, func=None, extra=None, sinfo=None):
+    record = _logger_make_record(self, name, level, fn, lno, msg, args, exc_info, func, None, sinfo)
+
+    # Same as `logging.Logger.makeRecord()` but the contextual fields can be given by ``extra``
+    for key, value in (extra or {}).items():
+        if (key in ('message', 'asctime')) or ((key in record.__dict__) and (key not in context)):
+            raise KeyError('Attempt to overwrite %r in LogRecord' % key)
+
+        record.__dict__[key] = value
+
+    return record
+
+
+def set_context_fields(names):
+    """Declare the contextual fields added to every log record.
+
+    ``logging.Logger.makeRecord()`` is only patched while contextual fields are
+    declared, so the values given by ``extra`` or a ``logging.LoggerAdapter``
+    take precedence over the context.
+    """
+    global context
+
+    context = {
+        name: context.get(name) or contextvars.ContextVar('nagare.log.' + name, default=CONTEXT_DEFAULT)
+        for name in names
+    }
+
+    factory = logging.getLogRecordFactory()
+    factory = getattr(factory, 'factory', factory)
+    logging.setLogRecordFactory(ContextRecordFactory(factory, context.items()) if context else factory)
+    logging.Logger.makeRecord = _make_record if context else _logger_make_record
+
+
+def set_context(**fields):
+    """Set values of contextual fields for the current request or task.
+
+    Returns:
+        tokens to give to ``reset_context()``
+    """
+    return [(context[name], context[name].set(value)) for name, value in fields.items()]
+
+
+def reset_context(tokens):
+    for field, token in tokens:
+        field.reset(token)
+
+
+def get_context():
+    return {name: value.get() for name, value in context.items()}
+
+
+def _overridden_is_enabled_for(self, level):
+    # Same early-outs as `logging.Logger.isEnabledFor()`, the override is only looked up for the disabled levels
+    if self.disabled:
+        return False
+
+    try:
+        if self._cache[level]:
+            return True
+    except KeyError:
+        if _is_enabled_for(self, level):
+            return True
+
+    override = level_override.get()
+    return (override is not None) and (level >= override) and (self.manager.disable < level)
+
+
+def _overridden_call_handlers(self, record):
+    override = level_override.get()
+    if (override is None) or (record.levelno < override):
+        return _call_handlers(self, record)
+
+    # Same as `logging.Logger.callHandlers()` without the handlers level check
+    found = 0
+    logger = self
+    while logger:
+        for handler in logger.handlers:
+            found += 1
+            handler.handle(record)
+
+        logger = logger.parent if logger.propagate else None
+
+    if not found:
+        _call_handlers(self, record)
+
+
+@contextlib.contextmanager
+def override_level(level=logging.DEBUG):
+    """Let the records of ``level`` and above pass the loggers and handlers levels in the current request or task.
+
+    The levels checks of the loggers are only patched while an override is
+    active so, the rest of the time, they cost exactly the same.
+    """
+    global nb_level_overrides
+
+    with level_overrides_lock:
+        nb_level_overrides += 1
+        if nb_level_overrides == 1:
+            logging.Logger.isEnabledFor = _overridden_is_enabled_for
+            logging.Logger.callHandlers = _overridden_call_handlers
+
+    token = level_override.set(logging._checkLevel(level))
+    try:
+        yield
+    finally:
+        level_override.reset(token)
+
+        with level_overrides_lock:
+            nb_level_overrides -= 1
+            if nb_level_overrides == 0:
+                logging.Logger.isEnabledFor = _is_enabled_for
+                logging.Logger.callHandlers = _call_handlers
+
+
 def get_logger(name=None, parent_logger=None):
     global logger_name
 
@@ -7,5 +7,7 @@
 # this distribution.
 # --
 
+from .services.binlog import BinaryFileHandler  # noqa: F401
 from .services.logging import StreamHandler  # noqa: F401
 from .services.logging import ColorizingFormatter as Formatter  # noqa: F401
+from .services.handlers import FileHandler, CompressingRotatingFileHandler  # noqa: F401
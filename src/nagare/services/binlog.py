@@ -0,0 +1,360 @@
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+"""Compact binary log records.
+
+A binary log file is a sequence of frames, each one a ``(kind, length)``
+header followed by its payload:
+
+  - ``HEADER``: written each time the file is opened or the strings table is
+    full. Resets the strings table
+  - ``STRING``: interns a string (logger name, format string, ...) under an id
+  - ``RECORD``: a log record with its timestamp in microseconds, the ids of its
+    interned strings, its raw arguments, its optional exception text and the
+    values of the contextual fields (see ``nagare.log.set_context()``)
+
+Formatting only happens when the records are decoded.
+"""
+
+import re
+import sys
+import struct
+import logging
+import argparse
+
+from nagare import log
+from nagare.services import handlers
+from nagare.services.logging import COLORS, STYLES, DEFAULT_FORMAT
+from nagare.services.timeindex import parse_time
+
+DESCRIPTION = """Decode binary log files.
+
+  `nagare-log-decode -l warning -n nagare.application app.blog`
+"""
+
+MAGIC = b'NGBLOG\x01'
+
+HEADER, STRING, RECORD = 0, 1, 2
+
+FRAME = struct.Struct('<BI')
+STRING_ID = struct.Struct('<I')
+RECORD_FIELDS = struct.Struct('<qiIIIIIIQIH')
+LENGTH = struct.Struct('<I')
+INT = struct.Struct('<q')
+FLOAT = struct.Struct('<d')
+COUNT = struct.Struct('<H')
+CONTEXT_FIELD = struct.Struct('<II')
+
+INT_MIN, INT_MAX = -(2**63), 2**63 - 1
+
+FORMAT_FIELDS = re.compile(r'%\((\w+)\)')
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord(None, None, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _encode_str(s, tag=b's'):
+    s = s.encode('utf-8', 'backslashreplace')
+    return tag + LENGTH.pack(len(s)) + s
+
+
+def encode_args(args):
+    """Encode the arguments of a record.
+
+    Returns:
+        the encoded arguments or ``None`` if an argument can't be encoded
+    """
+    encoded = []
+
+    for arg in args:
+        if arg is None:
+            encoded.append(b'N')
+        elif arg is True:
+            encoded.append(b'T')
+        elif arg is False:
+            encoded.append(b'F')
+        elif type(arg) is int and (INT_MIN <= arg <= INT_MAX):
+            encoded.append(b'i' + INT.pack(arg))
+        elif type(arg) is float:
+            encoded.append(b'd' + FLOAT.pack(arg))
+        elif type(arg) is str:
+            encoded.append(_encode_str(arg))
+        elif type(arg) is bytes:
+            encoded.append(b'b' + LENGTH.pack(len(arg)) + arg)
+        else:
+            return None
+
+    return b''.join(encoded)
+
+
+class BinaryFileHandler(logging.FileHandler):
+    """Append the records, unformatted, in a compact binary format.
+
+    Args:
+        filename: path of the log file
+        buffer_size: size of the write buffer
+        flush_level: records of this level and above flush the buffer
+        max_strings: size of the strings table. When full, the table is reset
+        delay: open the log file on the first emitted record
+    """
+
+    # The raw arguments are encoded, even when buffered by a ``ThreadBufferedHandler``
+    keep_args = True
+
+    def __init__(self, filename, buffer_size=1024 * 1024, flush_level='ERROR', max_strings=10000, delay=False):
+        self.buffer_size = int(buffer_size)
+        self.flush_level = logging._checkLevel(flush_level)
+        self.max_strings = int(max_strings)
+        self.strings = {}
+
+        super(BinaryFileHandler, self).__init__(filename, 'ab', delay=handlers._as_bool(delay))
+
+    def _open(self):
+        stream = open(self.baseFilename, self.mode, buffering=self.buffer_size)  # noqa: SIM115
+        stream.write(FRAME.pack(HEADER, len(MAGIC)) + MAGIC)
+        self.strings = {}
+
+        return stream
+
+    def intern(self, s, frames):
+        string_id = self.strings.get(s)
+        if string_id is None:
+            string_id = self.strings[s] = len(self.strings) + 1
+            s = s.encode('utf-8', 'backslashreplace')
+            frames.append(FRAME.pack(STRING, STRING_ID.size + len(s)) + STRING_ID.pack(string_id) + s)
+
+        return string_id
+
+    def encode(self, record):
+        frames = []
+
+        if len(self.strings) >= self.max_strings:
+            frames.append(FRAME.pack(HEADER, len(MAGIC)) + MAGIC)
+            self.strings = {}
+
+        # Messages without arguments are often already formatted so they are not interned
+        msg = record.msg
+        args = record.args if isinstance(record.args, tuple) and record.args else None
+        encoded_args = None if (args is None) or (type(msg) is not str) else encode_args(args)
+        if encoded_args is None:
+            msg, args = '%s', (record.getMessage(),)
+            encoded_args = _encode_str(args[0])
+
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = record.exc_text = (self.formatter or logging._defaultFormatter).formatException(record.exc_info)
+        if record.stack_info:
+            exc_text = (exc_text + '\n' if exc_text else '') + record.stack_info
+
+        payload = (
+            RECORD_FIELDS.pack(
+                int(record.created * 1000000),
+                record.levelno,
+                self.intern(record.levelname, frames),
+                self.intern(record.name, frames),
+                self.intern(msg, frames),
+                self.intern(record.pathname, frames),
+                self.intern(record.funcName or '', frames),
+                record.lineno or 0,
+                record.thread or 0,
+                record.process or 0,
+                len(args),
+            )
+            + encoded_args
+            + _encode_str(exc_text or '', b'')
+            + COUNT.pack(len(log.context))
+            + b''.join(
+                STRING_ID.pack(self.intern(name, frames)) + _encode_str(str(getattr(record, name, '')), b'')
+                for name in log.context
+            )
+        )
+        frames.append(FRAME.pack(RECORD, len(payload)) + payload)
+
+        return b''.join(frames)
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+
+            self.stream.write(self.encode(record))
+            if record.levelno >= self.flush_level:
+                self.stream.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+# -----------------------------------------------------------------------------
+
+
+def decode_args(payload, offset, nb_args):
+    args = []
+
+    for _ in range(nb_args):
+        tag = payload[offset : offset + 1]
+        offset += 1
+
+        if tag == b'N':
+            args.append(None)
+        elif tag == b'T':
+            args.append(True)
+        elif tag == b'F':
+            args.append(False)
+        elif tag == b'i':
+            args.append(INT.unpack_from(payload, offset)[0])
+            offset += INT.size
+        elif tag == b'd':
+            args.append(FLOAT.unpack_from(payload, offset)[0])
+            offset += FLOAT.size
+        elif tag in (b's', b'b'):
+            length = LENGTH.unpack_from(payload, offset)[0]
+            offset += LENGTH.size
+            arg = payload[offset : offset + length]
+            args.append(arg.decode('utf-8') if tag == b's' else arg)
+            offset += length
+        else:
+            raise ValueError('Invalid argument type {!r}'.format(tag))
+
+    return tuple(args), offset
+
+
+def read_records(stream):
+    """Decode the records of a binary log file.
+
+    Args:
+        stream: binary file object
+
+    Yields:
+        ``logging.LogRecord`` objects
+    """
+    strings = {}
+
+    while True:
+        frame = stream.read(FRAME.size)
+        if len(frame) < FRAME.size:
+            break
+
+        kind, length = FRAME.unpack(frame)
+        payload = stream.read(length)
+        if len(payload) < length:
+            break
+
+        if kind == HEADER:
+            if payload != MAGIC:
+                raise ValueError('Not a binary log file or unsupported version')
+            strings = {}
+
+        elif kind == STRING:
+            strings[STRING_ID.unpack_from(payload)[0]] = payload[STRING_ID.size :].decode('utf-8')
+
+        elif kind == RECORD:
+            created, levelno, levelname, name, msg, pathname, func_name, lineno, thread, process, nb_args = (
+                RECORD_FIELDS.unpack_from(payload)
+            )
+            args, offset = decode_args(payload, RECORD_FIELDS.size, nb_args)
+            length = LENGTH.unpack_from(payload, offset)[0]
+            offset += LENGTH.size
+            exc_text = payload[offset : offset + length].decode('utf-8')
+            offset += length
+
+            fields = {}
+            if offset < len(payload):
+                nb_fields = COUNT.unpack_from(payload, offset)[0]
+                offset += COUNT.size
+
+                for _ in range(nb_fields):
+                    field_name, length = CONTEXT_FIELD.unpack_from(payload, offset)
+                    offset += CONTEXT_FIELD.size
+                    fields[strings[field_name]] = payload[offset : offset + length].decode('utf-8')
+                    offset += length
+
+            fields.update(
+                {
+                    'created': created / 1000000,
+                    'msecs': (created % 1000000) // 1000,
+                    'levelno': levelno,
+                    'levelname': strings[levelname],
+                    'name': strings[name],
+                    'msg': strings[msg],
+                    'args': args,
+                    'pathname': strings[pathname],
+                    'funcName': strings[func_name],
+                    'lineno': lineno,
+                    'thread': thread,
+                    'process': process,
+                    'exc_text': exc_text or None,
+                }
+            )
+
+            yield logging.makeLogRecord(fields)
+
+
+def _parse_level(value):
+    return logging._checkLevel(value.upper())
+
+
+def decode(args):
+    level_min = args.level
+    loggers = tuple(args.loggers)
+    loggers_prefix = tuple(name + '.' for name in loggers)
+
+    style = args.style or ('light' if getattr(sys.stdout, 'isatty', lambda: False)() else 'nocolors')
+    colors = {name: ''.join(COLORS.get(c.upper(), '') for c in color) for name, color in STYLES[style].items()}
+
+    formatter = logging.Formatter(args.format)
+
+    # Contextual fields missing from the records logged before their declaration
+    fields = set(FORMAT_FIELDS.findall(args.format)) - RECORD_ATTRIBUTES
+
+    for filename in args.files:
+        with open(filename, 'rb') as stream:
+            for record in read_records(stream):
+                if record.levelno < level_min:
+                    continue
+
+                if loggers and (record.name not in loggers) and not record.name.startswith(loggers_prefix):
+                    continue
+
+                if (args.since is not None) and (record.created < args.since):
+                    continue
+
+                if (args.until is not None) and (record.created > args.until):
+                    continue
+
+                for name in fields:
+                    record.__dict__.setdefault(name, log.CONTEXT_DEFAULT)
+
+                color = colors.get(record.levelname.lower())
+                message = formatter.format(record)
+                sys.stdout.write((color + message + COLORS['RESET_ALL'] if color else message) + '\n')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('files', nargs='+', help='Binary log files')
+    parser.add_argument('-l', '--level', type=_parse_level, default=0, help='Minimum level of the records to display')
+    parser.add_argument(
+        '-n', '--logger', action='append', dest='loggers', default=[], help='Display only this logger and its children'
+    )
+    parser.add_argument('--since', type=parse_time, help='Start time, as ISO 8601 date or timestamp')
+    parser.add_argument('--until', type=parse_time, help='End time, as ISO 8601 date or timestamp')
+    parser.add_argument('-f', '--format', default=DEFAULT_FORMAT, help='Format of the rendered records')
+    parser.add_argument('-s', '--style', choices=sorted(STYLES), help='Color theme')
+    parser.set_defaults(func=decode)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+"""Bounded representation of the local variables of the traceback frames."""
+
+import time
+import reprlib
+import itertools
+import traceback
+
+
+class BoundedRepr(reprlib.Repr):
+    """Truncated representations of strings and containers.
+
+    Only the builtin types are represented through their ``__repr__``. The
+    other objects are only displayed by their type and id as their
+    ``__repr__`` can be arbitrary slow (database queries, huge arrays ...).
+
+    The dictionaries and sets are not sorted, only their first items are
+    represented, and the containers of more than ``max_size`` items are only
+    displayed by their type and size.
+    """
+
+    CONTAINERS = (list, tuple, dict, set, frozenset)
+
+    def __init__(self, max_length=200, max_items=10, max_size=100000):
+        super(BoundedRepr, self).__init__()
+
+        self.max_length = max_length
+        self.maxlevel = 3
+        self.maxstring = self.maxlong = self.maxother = max_length
+        self.maxtuple = self.maxlist = self.maxarray = self.maxdict = max_items
+        self.maxset = self.maxfrozenset = self.maxdeque = max_items
+        self.max_size = max_size
+
+    def repr1(self, x, level):
+        if isinstance(x, self.CONTAINERS) and (len(x) > self.max_size):
+            return '<{} of {} items>'.format(type(x).__name__, len(x))
+
+        return super(BoundedRepr, self).repr1(x, level)
+
+    def repr_dict(self, x, level):
+        if not x:
+            return '{}'
+
+        if level <= 0:
+            return '{...}'
+
+        items = [
+            '{}: {}'.format(self.repr1(key, level - 1), self.repr1(value, level - 1))
+            for key, value in itertools.islice(x.items(), self.maxdict)
+        ]
+        if len(x) > self.maxdict:
+            items.append('...')
+
+        return '{' + ', '.join(items) + '}'
+
+    def repr_bytes(self, x, level):
+        # Sliced before its representation, as `reprlib.Repr.repr_str()` does
+        s = repr(x[: self.maxstring])
+        if len(s) > self.maxstring:
+            i = max(0, (self.maxstring - 3) // 2)
+            j = max(0, self.maxstring - 3 - i)
+            s = s[:i] + '...' + s[len(s) - j :]
+
+        return s
+
+    repr_bytearray = repr_bytes
+
+    def repr_set(self, x, level):
+        return self._repr_iterable(x, level, '{', '}', self.maxset) if x else 'set()'
+
+    def repr_frozenset(self, x, level):
+        return self._repr_iterable(x, level, 'frozenset({', '})', self.maxfrozenset) if x else 'frozenset()'
+
+    def repr_instance(self, x, level):
+        cls = type(x)
+        if cls.__module__ != 'builtins':
+            return '<{}.{} object at {:#x}>'.format(cls.__module__, cls.__qualname__, id(x))
+
+        return super(BoundedRepr, self).repr_instance(x, level)
+
+    def repr(self, x):
+        try:
+            s = super(BoundedRepr, self).repr(x)
+        except Exception as e:
+            s = '<repr error: {}>'.format(type(e).__name__)
+
+        return s if len(s) <= self.max_length else (s[: self.max_length - 3] + '...')
+
+
+class FrameLocals(object):
+    """Render the local variables of the innermost frames of a traceback.
+
+    Args:
+        frames: number of innermost frames to render the local variables of
+        max_length: maximum length of the representation of a value
+        max_items: maximum number of represented items of a container
+        budget: maximum total length of the rendered local variables
+        timeout: maximum time, in seconds, spent rendering the local variables
+    """
+
+    def __init__(self, frames=1, max_length=200, max_items=10, budget=4000, timeout=0.05):
+        self.frames = frames
+        self.budget = budget
+        self.timeout = timeout
+        self.repr = BoundedRepr(max_length, max_items).repr
+
+    def render(self, tb):
+        """Render the local variables.
+
+        Args:
+            tb: the traceback
+
+        Returns:
+            a list of ``name = value`` lines for each frame of the traceback
+        """
+        frames = [frame for frame, _ in traceback.walk_tb(tb)]
+        lines = [[] for _ in frames]
+
+        budget = self.budget
+        deadline = time.monotonic() + self.timeout
+
+        for i in reversed(range(max(len(frames) - self.frames, 0), len(frames))):
+            for name, value in list(frames[i].f_locals.items()):
+                if (budget <= 0) or (time.monotonic() > deadline):
+                    lines[i].append('...')
+                    return lines
+
+                line = '{} = {}'.format(name, self.repr(value))
+                lines[i].append(line)
+                budget -= len(line)
+
+        return lines
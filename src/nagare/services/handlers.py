@@ -0,0 +1,464 @@
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+"""Log handlers shipped with the log service."""
+
+import os
+import re
+import sys
+import copy
+import time
+import queue
+import locale
+import shutil
+import logging
+import weakref
+import importlib
+import threading
+import traceback
+import contextlib
+import logging.handlers
+from concurrent import futures
+
+from nagare.services.timeindex import TimeIndex, index_filename
+
+# Extension and module of each compression. The modules are only imported when used
+COMPRESSORS = {
+    'gzip': ('.gz', 'gzip'),
+    'bz2': ('.bz2', 'bz2'),
+    'lzma': ('.xz', 'lzma'),
+    'zstd': ('.zst', 'zstandard'),
+}
+
+
+def _get_compressor(compression):
+    if compression not in COMPRESSORS:
+        raise ValueError('Unknown compression {!r}'.format(compression))
+
+    extension, module = COMPRESSORS[compression]
+    try:
+        return extension, importlib.import_module(module).open
+    except ImportError:
+        raise ImportError('`{}` module required for {} compression'.format(module, compression)) from None
+
+
+def _as_bool(value):
+    """Convert a boolean parameter, given as a string in the ``handler_*`` sections."""
+    return value.strip().lower() in ('true', 'yes', 'on', '1') if isinstance(value, str) else bool(value)
+
+
+def _create_index(filename, mode, index_every, index_interval):
+    index_every = int(index_every)
+    index_interval = float(index_interval)
+
+    return TimeIndex(filename, mode, index_every, index_interval) if (index_every or index_interval) else None
+
+
+class FileHandler(logging.FileHandler):
+    """File handler optionally maintaining a sparse time index of its records.
+
+    Args:
+        filename: path of the log file
+        mode: opening mode of the log file
+        encoding: encoding of the log file
+        delay: open the log file on the first emitted record
+        index_every: add an index entry every ``index_every`` records. ``0`` to disable
+        index_interval: add an index entry every ``index_interval`` seconds. ``0`` to disable
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, delay=False, index_every=0, index_interval=0):
+        super(FileHandler, self).__init__(filename, mode, encoding, _as_bool(delay))
+        self.index = _create_index(self.baseFilename, mode, index_every, index_interval)
+
+    def emit(self, record):
+        if (self.index is not None) and self.index.due(record):
+            try:
+                if self.stream is None:
+                    self.stream = self._open()
+
+                self.index.add(record, self.stream.tell())
+            except Exception:
+                self.handleError(record)
+
+        super(FileHandler, self).emit(record)
+
+    def close(self):
+        super(FileHandler, self).close()
+
+        if self.index is not None:
+            self.index.close()
+
+
+class CompressingRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """Rotate by size and/or time, compressing the rotated files in background threads.
+
+    The rollover check only compares an in-memory byte counter and the record
+    timestamp against precomputed limits. The rotated file is renamed inline but
+    its compression is handed to a pool of at most ``max_jobs`` threads so the
+    emitting thread never waits for it.
+
+    Args:
+        filename: path of the log file
+        mode: opening mode of the log file
+        max_bytes: rotate when the file would grow beyond this size. ``0`` to disable
+        interval: rotate every ``interval`` seconds (aligned on the epoch). ``0`` to disable
+        backup_count: number of rotated files to keep. ``0`` to keep them all
+        compression: ``gzip``, ``bz2``, ``lzma``, ``zstd`` or empty to not compress
+        max_jobs: maximum number of concurrent compressions
+        encoding: encoding of the log file
+        delay: open the log file on the first emitted record
+        index_every: add an index entry every ``index_every`` records. ``0`` to disable
+        index_interval: add an index entry every ``index_interval`` seconds. ``0`` to disable
+    """
+
+    def __init__(
+        self,
+        filename,
+        mode='a',
+        max_bytes=0,
+        interval=0,
+        backup_count=0,
+        compression='gzip',
+        max_jobs=1,
+        encoding=None,
+        delay=False,
+        index_every=0,
+        index_interval=0,
+    ):
+        self.extension, self.compressor = _get_compressor(compression) if compression else ('', None)
+
+        super(CompressingRotatingFileHandler, self).__init__(filename, mode, encoding, _as_bool(delay))
+
+        # The size of the file is counted in bytes, as ``max_bytes``
+        self.codec = self.encoding if self.encoding not in (None, 'locale') else locale.getpreferredencoding(False)
+        self.max_bytes = int(max_bytes)
+        self.interval = int(interval)
+        self.backup_count = int(backup_count)
+
+        self.jobs = futures.ThreadPoolExecutor(int(max_jobs), 'log-compression') if compression else None
+        self.purge_lock = threading.Lock()
+        self.index = _create_index(self.baseFilename, mode, index_every, index_interval)
+
+        dirname, basename = os.path.split(self.baseFilename)
+        self.rotated_files = re.compile(re.escape(basename) + r'\.(\d{8}-\d{6})(?:\.(\d+))?(\.(gz|bz2|xz|zst))?$')
+
+        self.size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+        self.rollover_at = self.compute_rollover(time.time())
+
+    def compute_rollover(self, now):
+        return ((now // self.interval) + 1) * self.interval if self.interval else float('inf')
+
+    def shouldRollover(self, record, size=0):
+        return (record.created >= self.rollover_at) or (0 < self.max_bytes < self.size + size)
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            size = len(msg.encode(self.codec, 'replace'))
+            if self.shouldRollover(record, size) and self.size:
+                self.doRollover()
+            elif record.created >= self.rollover_at:
+                self.rollover_at = self.compute_rollover(record.created)
+
+            if self.stream is None:
+                self.stream = self._open()
+
+            if (self.index is not None) and self.index.due(record):
+                self.index.add(record, self.stream.tell())
+
+            self.stream.write(msg)
+            self.size += size
+            self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def rotated_filename(self):
+        filename = base = self.baseFilename + time.strftime('.%Y%m%d-%H%M%S')
+
+        i = 0
+        while os.path.exists(filename) or os.path.exists(filename + self.extension):
+            i += 1
+            filename = '{}.{}'.format(base, i)
+
+        return filename
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        if os.path.exists(self.baseFilename):
+            filename = self.rotated_filename()
+            os.rename(self.baseFilename, filename)
+
+            if (self.index is not None) and os.path.exists(self.index.filename):
+                self.index.close()
+                if self.jobs is None:
+                    os.rename(self.index.filename, index_filename(filename))
+                else:
+                    os.remove(self.index.filename)
+
+            if self.jobs is None:
+                self.purge()
+            else:
+                self.jobs.submit(self.compress, filename)
+
+        self.size = 0
+        self.rollover_at = self.compute_rollover(time.time())
+
+        if not self.delay:
+            self.stream = self._open()
+
+    def compress(self, filename):
+        try:
+            tmp_filename = filename + self.extension + '.tmp'
+            with open(filename, 'rb') as src, self.compressor(tmp_filename, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+
+            os.rename(tmp_filename, filename + self.extension)
+            os.remove(filename)
+        except Exception:
+            if logging.raiseExceptions:
+                traceback.print_exc(file=sys.stderr)
+
+        self.purge()
+
+    def purge(self):
+        if not self.backup_count:
+            return
+
+        with self.purge_lock:
+            dirname, basename = os.path.split(self.baseFilename)
+            rotated_files = []
+            for filename in os.listdir(dirname):
+                rotated = self.rotated_files.match(filename)
+                # The rotated files not yet compressed are left to their compression job
+                if rotated and ((self.jobs is None) or rotated.group(3)):
+                    timestamp, i = rotated.group(1, 2)
+                    rotated_files.append((timestamp, int(i or 0), filename))
+
+            for _, _, filename in sorted(rotated_files)[: -self.backup_count]:
+                filename = os.path.join(dirname, filename)
+                for name in (filename, index_filename(filename)):
+                    with contextlib.suppress(OSError):
+                        os.remove(name)
+
+    def close(self):
+        super(CompressingRotatingFileHandler, self).close()
+
+        if self.index is not None:
+            self.index.close()
+
+        if self.jobs is not None:
+            self.jobs.shutdown(wait=True)
+
+
+# Handlers whose ``emit()`` of a record without exception only writes the formatted record to their stream
+STREAM_EMITS = {logging.StreamHandler.emit, logging.FileHandler.emit}
+
+# Arguments that can't change between the emission of a record and its formatting
+IMMUTABLE_ARGS = {str, int, float, bool, bytes, type(None)}
+
+_buffered_handlers = weakref.WeakSet()
+
+
+def _restart_writers():
+    for handler in list(_buffered_handlers):
+        handler.start_writer()
+
+
+if hasattr(os, 'register_at_fork'):
+    # The writer threads don't survive a fork
+    os.register_at_fork(after_in_child=_restart_writers)
+
+
+class ThreadBufferedHandler(logging.Handler):
+    """Format the records in the emitting threads and write them in batches from a single writer thread.
+
+    Each thread formats its records, without any shared lock, into its own
+    buffer. The buffer is handed off to the writer thread when full, when a
+    record of ``flush_level`` or above is logged or, by the writer thread
+    itself, every ``flush_interval`` seconds. The records of a thread are
+    written in order.
+
+    The records the target handler has to emit itself (exceptions, handlers
+    other than plain stream handlers) have their message and exception
+    rendered in the emitting thread, as ``logging.handlers.QueueHandler``
+    does. Their arguments are only kept if the target has a ``keep_args``
+    attribute and they are immutable.
+
+    Args:
+        target: handler to write the records to
+        batch_size: number of records buffered by a thread
+        flush_interval: maximum time, in seconds, a record stays buffered
+        flush_level: records of this level and above are immediately handed off
+    """
+
+    def __init__(self, target, batch_size=64, flush_interval=0.1, flush_level='ERROR'):
+        super(ThreadBufferedHandler, self).__init__()
+
+        self.target = target
+        self.keep_args = getattr(target, 'keep_args', False)
+        self.batch_size = int(batch_size)
+        self.flush_interval = float(flush_interval)
+        self.flush_level = logging._checkLevel(flush_level)
+
+        self.start_writer()
+        _buffered_handlers.add(self)
+
+    def start_writer(self):
+        """Start the writer thread with empty buffers.
+
+        Also called in a forked child, where the records buffered before the
+        fork are left to the parent process.
+        """
+        self.local = threading.local()
+        self.buffers = []
+        self.buffers_lock = threading.Lock()
+        self.batches = queue.SimpleQueue()
+
+        self.writer = threading.Thread(target=self.write_batches, name='log-writer', daemon=True)
+        self.writer.start()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def format(self, record):
+        return self.target.format(record)
+
+    def get_buffer(self):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            buffer = self.local.buffer = (threading.current_thread(), threading.Lock(), [])
+            with self.buffers_lock:
+                self.buffers.append(buffer)
+
+        return buffer
+
+    def handle(self, record):
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+
+        return rv
+
+    def prepare(self, record):
+        # The record is shared with the other handlers, which can change it before it's written
+        record = copy.copy(record)
+
+        args = record.args
+        if args and not (
+            self.keep_args and isinstance(args, tuple) and all(type(arg) in IMMUTABLE_ARGS for arg in args)
+        ):
+            record.msg = record.getMessage()
+            record.args = None
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = (self.target.formatter or logging._defaultFormatter).formatException(record.exc_info)
+
+        return record
+
+    def emit(self, record):
+        target = self.target
+
+        try:
+            if record.exc_info or (type(target).emit not in STREAM_EMITS) or (target.stream is None):
+                item = self.prepare(record)
+            else:
+                item = self.format(record) + target.terminator
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+            return
+
+        _, lock, records = self.get_buffer()
+        with lock:
+            records.append(item)
+            if (len(records) >= self.batch_size) or (record.levelno >= self.flush_level):
+                self.batches.put(records[:])
+                del records[:]
+
+    def drain(self):
+        with self.buffers_lock:
+            buffers = self.buffers[:]
+
+        for thread, lock, records in buffers:
+            with lock:
+                if records:
+                    self.batches.put(records[:])
+                    del records[:]
+
+            if not thread.is_alive():
+                with self.buffers_lock:
+                    self.buffers.remove((thread, lock, records))
+
+    def write(self, batch):
+        target = self.target
+
+        target.acquire()
+        try:
+            for item in batch:
+                if isinstance(item, str):
+                    target.stream.write(item)
+                else:
+                    target.handle(item)
+
+            target.flush()
+        except Exception:
+            if logging.raiseExceptions:
+                traceback.print_exc(file=sys.stderr)
+        finally:
+            target.release()
+
+    def write_batches(self):
+        next_drain = time.monotonic() + self.flush_interval
+
+        while True:
+            try:
+                batch = self.batches.get(timeout=self.flush_interval)
+            except queue.Empty:
+                batch = []
+
+            if batch is None:
+                break
+
+            if isinstance(batch, threading.Event):
+                # All the batches queued before have been written
+                batch.set()
+                continue
+
+            if batch:
+                self.write(batch)
+
+            if time.monotonic() >= next_drain:
+                self.drain()
+                next_drain = time.monotonic() + self.flush_interval
+
+    def flush(self):
+        """Hand off the buffered records and wait for the writer thread to write them."""
+        self.drain()
+
+        if self.writer.is_alive() and (threading.current_thread() is not self.writer):
+            written = threading.Event()
+            self.batches.put(written)
+            written.wait()
+
+    def close(self):
+        _buffered_handlers.discard(self)
+
+        if self.writer.is_alive():
+            self.drain()
+            self.batches.put(None)
+            self.writer.join()
+
+        self.target.close()
+        super(ThreadBufferedHandler, self).close()
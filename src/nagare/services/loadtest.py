@@ -0,0 +1,484 @@
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+"""Load test of the logging configuration of an application."""
+
+import os
+import re
+import sys
+import time
+import array
+import queue
+import random
+import shutil
+import socket
+import inspect
+import logging
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import multiprocessing
+import logging.handlers
+
+from validate import Validator
+from configobj import ConfigObj, flatten_errors
+
+from nagare import log
+from nagare.services import binlog, handlers
+from nagare.services.logging import Logger, DictConfigurator
+
+DESCRIPTION = """Measure the throughput, the latency and the memory of a logging configuration.
+
+  `nagare-log-loadtest -t 8 -n 10000 --levels debug:10,info:80,error:10 conf/app.cfg`
+"""
+
+PERCENTILES = (50, 90, 99, 99.9)
+HELP = re.compile(r',?\s*help="[^"]*"')
+
+# Parameters of a handler kept when its destination is replaced by a local file
+HANDLER_PARAMS = ('level', 'formatter', 'filters') + tuple(DictConfigurator.BATCHING_PARAMS)
+
+# `tracemalloc.reset_peak()` is only available from Python 3.9
+RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+# Seconds the child processes wait for each other before logging
+START_TIMEOUT = 60
+
+
+class ConfigurationError(ValueError):
+    pass
+
+
+# -----------------------------------------------------------------------------
+
+
+class Sink(object):
+    """Local socket reading and discarding everything sent to it."""
+
+    def __init__(self, socktype=socket.SOCK_STREAM):
+        self.socket = socket.socket(socket.AF_INET, socktype)
+        self.socket.bind(('127.0.0.1', 0))
+        self.address = self.socket.getsockname()
+
+        if socktype == socket.SOCK_STREAM:
+            self.socket.listen(16)
+            target = self.accept
+        else:
+            target = self.discard
+
+        threading.Thread(target=target, args=(self.socket,), daemon=True).start()
+
+    def accept(self, s):
+        while True:
+            try:
+                connection, _ = s.accept()
+            except OSError:
+                break
+
+            threading.Thread(target=self.discard, args=(connection,), daemon=True).start()
+
+    @staticmethod
+    def discard(s):
+        try:
+            while s.recv(65536):
+                pass
+        except OSError:
+            pass
+
+    def close(self):
+        self.socket.close()
+
+
+def _handlers_config(config):
+    """Return the configurations of the handlers, from the ``handlers`` and ``handler_*`` sections."""
+    handlers_config = dict(config['handlers'])
+    if config['handler']:
+        handlers_config['handler'] = config['handler']
+
+    handlers_config.update({name: section for name, section in config.items() if name.startswith('handler_')})
+
+    return handlers_config
+
+
+def substitute_destinations(config, directory):
+    """Replace the destinations of the handlers by local stand-ins.
+
+    Args:
+        config: validated configuration of the log service
+        directory: where to create the stand-in files
+
+    Returns:
+        the local sockets and stand-in streams created, to close after the test
+    """
+    configurator = DictConfigurator()
+    sinks = []
+
+    for name, handler in _handlers_config(config).items():
+        class_name = handler.get('class')
+        if not class_name:
+            continue
+
+        if class_name.startswith('nagare.logging.'):
+            # Don't import `nagare.logging` before its `StreamHandler` is set by the log service
+            class_name = class_name.rsplit('.', 1)[1]
+            cls = getattr(handlers, class_name, None) or getattr(binlog, class_name, None)
+        else:
+            cls = configurator.resolve(class_name)
+
+        # Positional arguments are converted into keyword arguments
+        args = handler.pop('args', None)
+        if args:
+            args = eval(args, {'sys': sys, 'logging': logging})  # noqa: S307
+            handler.update(inspect.signature(cls or logging.StreamHandler).bind_partial(*args).arguments)
+
+        filename = os.path.join(directory, name + '.log')
+
+        if (cls is None) or (issubclass(cls, logging.StreamHandler) and not issubclass(cls, logging.FileHandler)):
+            handler['stream'] = stream = open(filename, 'a')  # noqa: SIM115
+            sinks.append(stream)
+        elif issubclass(cls, logging.FileHandler):
+            handler['filename'] = os.path.join(directory, os.path.basename(handler.get('filename', filename)))
+        elif issubclass(cls, logging.handlers.SocketHandler):
+            sink = Sink(socket.SOCK_DGRAM if issubclass(cls, logging.handlers.DatagramHandler) else socket.SOCK_STREAM)
+            handler['host'], handler['port'] = sink.address
+            sinks.append(sink)
+        elif issubclass(cls, logging.handlers.SysLogHandler):
+            sink = Sink(int(handler.get('socktype', socket.SOCK_DGRAM)))
+            handler['address'] = sink.address
+            sinks.append(sink)
+        elif issubclass(cls, (logging.handlers.SMTPHandler, logging.handlers.HTTPHandler)):
+            params = {name: handler[name] for name in HANDLER_PARAMS if name in handler}
+            handler.clear()
+            handler.update(params, **{'class': 'logging.FileHandler', 'filename': filename})
+
+    return sinks
+
+
+def _validation_spec(spec):
+    """Remove the ``help`` parameters from a spec, unknown to the ``validate`` module."""
+    if isinstance(spec, dict):
+        return {name: _validation_spec(value) for name, value in spec.items()}
+
+    return HELP.sub('', spec)
+
+
+def load_config(filename, section, app_name):
+    """Read and validate the configuration of the log service."""
+    spec = ConfigObj(_validation_spec(Logger.CONFIG_SPEC), interpolation=False)
+
+    config = ConfigObj(filename, interpolation=False).get(section, {})
+    config = ConfigObj(config, configspec=spec, interpolation=False)
+
+    results = config.validate(Validator(), preserve_errors=True)
+    if results is not True:
+        errors = [
+            '  [{}] {}: {}'.format('/'.join(sections) or section, name or '', error or 'missing value')
+            for sections, name, error in flatten_errors(config, results)
+        ]
+        raise ConfigurationError('Invalid configuration of {}:\n{}'.format(filename, '\n'.join(errors)))
+
+    config = config.dict()
+    config['_app_name'] = app_name
+
+    return config
+
+
+def configure(args, directory):
+    config = load_config(args.config, args.section, args.app_name)
+    sinks = substitute_destinations(config, directory) if args.substitute else []
+
+    Logger(args.section, None, **config)
+
+    return sinks
+
+
+def get_handlers():
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values() if isinstance(logger, logging.Logger)
+    ]
+
+    return list({handler: None for logger in loggers for handler in logger.handlers})
+
+
+# -----------------------------------------------------------------------------
+
+
+def _raise(depth):
+    if depth:
+        _raise(depth - 1)
+
+    raise ValueError('Load test exception')
+
+
+def generate(args, seed):
+    """Generate the ``(level, message, exception)`` records to log."""
+    rand = random.Random(seed)  # noqa: S311
+
+    levels, weights = zip(*args.levels)
+    levels = rand.choices(levels, weights, k=args.records)
+    sizes = rand.choices(args.sizes, k=args.records)
+    exceptions = [rand.random() < args.exceptions for _ in range(args.records)]
+
+    return [('x' * size, level, exception) for size, level, exception in zip(sizes, levels, exceptions)]
+
+
+def drive(logger, records, latencies):
+    for message, level, exception in records:
+        if exception:
+            try:
+                _raise(5)
+            except ValueError:
+                t0 = time.perf_counter_ns()
+                logger.log(level, 'Load test record %d: %s', 42, message, exc_info=True)
+        else:
+            t0 = time.perf_counter_ns()
+            logger.log(level, 'Load test record %d: %s', 42, message)
+
+        latencies.append(time.perf_counter_ns() - t0)
+
+
+def run(args, directory, process=0, start=None):
+    """Log the generated records from ``args.threads`` threads.
+
+    Args:
+        args: command line arguments
+        directory: where to create the stand-in files
+        process: number of the child process, 0 in the main process
+        start: barrier the child processes wait on, once configured, to start logging together
+
+    Returns:
+        the elapsed time and the latencies of the records
+    """
+    sinks = configure(args, directory) if process else []
+
+    logger = log.get_logger()
+    latencies = [array.array('q') for _ in range(args.threads)]
+
+    threads = [
+        threading.Thread(target=drive, args=(logger, generate(args, '{}-{}'.format(process, i)), latencies[i]))
+        for i in range(args.threads)
+    ]
+
+    if start is not None:
+        start.wait(START_TIMEOUT)
+
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    for handler in get_handlers():
+        handler.flush()
+
+    elapsed = time.perf_counter() - t0
+
+    if process:
+        logging.shutdown()
+
+        for sink in sinks:
+            sink.close()
+
+    return elapsed, b''.join(latency.tobytes() for latency in latencies)
+
+
+def _run_process(args, directory, process, start, results):
+    results.put(run(args, directory, process, start))
+
+
+def run_processes(args, directory):
+    """Run the load test in ``args.processes`` child processes, all starting to log at the same time.
+
+    Returns:
+        the elapsed times and the latencies of the records of each process
+    """
+    start = multiprocessing.Barrier(args.processes)
+    results = multiprocessing.Queue()
+
+    processes = [
+        multiprocessing.Process(target=_run_process, args=(args, directory, i + 1, start, results))
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    received = []
+    try:
+        while len(received) < len(processes):
+            try:
+                received.append(results.get(timeout=1))
+            except queue.Empty:
+                if any(process.exitcode for process in processes):
+                    raise RuntimeError('Load test process failed') from None
+    finally:
+        for process in processes:
+            if len(received) < len(processes):
+                process.terminate()
+            process.join()
+
+    return received
+
+
+def measure_memory(args):
+    """Log the generated records, in one thread, tracing the memory allocated by each handler.
+
+    Returns:
+        the peak of memory allocated by each handler to handle a record and the total memory retained
+    """
+    memory = {}
+
+    def traced(handler, handle):
+        def _(record):
+            current = tracemalloc.get_traced_memory()[0]
+            if RESET_PEAK:
+                tracemalloc.reset_peak()
+            try:
+                return handle(record)
+            finally:
+                # Without `reset_peak()`, only the memory still allocated after the record is measured
+                allocated = tracemalloc.get_traced_memory()[1 if RESET_PEAK else 0]
+                memory[handler] = max(memory.get(handler, 0), allocated - current)
+
+        return _
+
+    log_handlers = get_handlers()
+    for handler in log_handlers:
+        handler.handle = traced(handler, handler.handle)
+
+    records = generate(args, 'memory')
+
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+
+    drive(log.get_logger(), records, array.array('q'))
+    for handler in log_handlers:
+        handler.flush()
+
+    retained = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+
+    for handler in log_handlers:
+        del handler.handle
+
+    return memory, retained
+
+
+def percentile(latencies, p):
+    return latencies[min(int(len(latencies) * p / 100), len(latencies) - 1)] if latencies else 0
+
+
+def _size(n):
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(n) < 1024:
+            break
+        n /= 1024
+
+    return '{:.1f} {}'.format(n, unit)
+
+
+def load_test(args):
+    directory = args.directory or tempfile.mkdtemp(prefix='nagare-log-loadtest-')
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    sinks = configure(args, directory)
+
+    try:
+        results = run_processes(args, directory) if args.processes > 1 else [run(args, directory)]
+
+        elapsed = max(elapsed for elapsed, _ in results)
+        latencies = array.array('q')
+        for _, latency in results:
+            latencies.frombytes(latency)
+        latencies = sorted(latencies)
+
+        print('Records: {}'.format(len(latencies)))
+        print('Throughput: {:.0f} records/s'.format(len(latencies) / elapsed))
+        print('Latency:')
+        for p in PERCENTILES:
+            print('  p{:<5} {:>10.1f} us'.format(p, percentile(latencies, p) / 1000))
+        print('  max    {:>10.1f} us'.format((latencies[-1] if latencies else 0) / 1000))
+
+        if args.memory:
+            memory, retained = measure_memory(args)
+
+            print('Peak memory per record:' if RESET_PEAK else 'Memory retained per record:')
+            for handler, peak in memory.items():
+                print('  {:<40} {:>12}'.format('{} ({})'.format(handler.name, type(handler).__name__), _size(peak)))
+            print('Retained memory: {}'.format(_size(retained)))
+    finally:
+        logging.shutdown()
+
+        for sink in sinks:
+            sink.close()
+
+        if args.directory is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _parse_levels(value):
+    levels = []
+    for level in value.split(','):
+        level, _, weight = level.partition(':')
+        levels.append((logging._checkLevel(level.strip().upper()), float(weight or 1)))
+
+    return levels
+
+
+def _parse_sizes(value):
+    return [int(size) for size in value.split(',')]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('config', help='Application configuration file')
+    parser.add_argument('--section', default='logging', help='Section of the log service')
+    parser.add_argument('--app-name', default='app', help='Name of the application')
+    parser.add_argument('-t', '--threads', type=int, default=1, help='Number of logging threads per process')
+    parser.add_argument('-p', '--processes', type=int, default=1, help='Number of logging processes')
+    parser.add_argument('-n', '--records', type=int, default=10000, help='Number of records logged by each thread')
+    parser.add_argument(
+        '--levels',
+        type=_parse_levels,
+        default='debug:10,info:70,warning:15,error:5',
+        help='Weighted levels of the records, as `level:weight,...`',
+    )
+    parser.add_argument(
+        '--sizes', type=_parse_sizes, default='32,128,1024', help='Message sizes, randomly chosen, as `size,...`'
+    )
+    parser.add_argument('--exceptions', type=float, default=0.01, help='Ratio of records with an exception')
+    parser.add_argument(
+        '--no-substitute',
+        action='store_false',
+        dest='substitute',
+        help='Keep the real destinations of the handlers instead of local files and sockets',
+    )
+    parser.add_argument('-d', '--directory', help='Directory of the stand-in files, kept after the test')
+    parser.add_argument('-m', '--memory', action='store_true', help='Measure the memory of each handler')
+    parser.set_defaults(func=load_test)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        args.func(args)
+    except ConfigurationError as e:
+        sys.exit(str(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -11,9 +11,13 @@ from __future__ import absolute_import
 
 import os
 import sys
+import time
+import atexit
 import logging
 import warnings as warnings_modules
+import threading
 import traceback
+import collections
 import logging.config
 from os import path
 
@@ -22,7 +26,8 @@ import chromalog
 from chromalog import ColorizingFormatter  # noqa: F401
 
 from nagare import log
-from nagare.services import plugin, backtrace
+from nagare.services import plugin, handlers, backtrace
+from nagare.services.frame_locals import FrameLocals
 
 COLORS = {'': ''}
 COLORS.update(colorama.Fore.__dict__)
@@ -95,7 +100,15 @@ StreamHandler = None
 
 class ColorizingStreamHandler(chromalog.ColorizingStreamHandler):
     def __init__(
-        self, stream=sys.stderr, colors=None, simplified=True, conservative=True, reverse=False, align=True, keep_path=2
+        self,
+        stream=sys.stderr,
+        colors=None,
+        simplified=True,
+        conservative=True,
+        reverse=False,
+        align=True,
+        keep_path=2,
+        frame_locals=None,
     ):
         colors = colors or {}
 
@@ -111,6 +124,7 @@ class ColorizingStreamHandler(chromalog.ColorizingStreamHandler):
         self.reverse = reverse
         self.align = align
         self.keep_path = keep_path
+        self.frame_locals = frame_locals
 
         self.style = {
             category: (CATEGORIES[conservative].get(category, '%s') % color) + '{}'
@@ -122,14 +136,22 @@ class ColorizingStreamHandler(chromalog.ColorizingStreamHandler):
         isatty = getattr(self.stream, 'isatty', lambda: False)()
         if not (isatty and record.exc_info and self.style):
             super(ColorizingStreamHandler, self).emit(record)
+
+            if record.exc_info and self.frame_locals:
+                self.emit_locals(record.exc_info[2])
         else:
             exc_type, exc_value, exc_tb = record.exc_info
 
             if exc_type is SyntaxError:
                 super(ColorizingStreamHandler, self).emit(record)
             else:
-                record.exc_info = None
-                super(ColorizingStreamHandler, self).emit(record)
+                # The record is shared with the other handlers, its exception is restored once emitted
+                exc_info, exc_text = record.exc_info, record.exc_text
+                record.exc_info = record.exc_text = None
+                try:
+                    super(ColorizingStreamHandler, self).emit(record)
+                finally:
+                    record.exc_info, record.exc_text = exc_info, exc_text
 
                 tb = last_chain_seen = exc_tb
                 while self.simplified and tb:
@@ -168,6 +190,13 @@ class ColorizingStreamHandler(chromalog.ColorizingStreamHandler):
 
                 trace = parser.generate_backtrace(self.style)
 
+                if self.frame_locals:
+                    frame_locals = self.frame_locals.render(last_chain_seen)
+                    trace = [
+                        '\n'.join([line.rstrip()] + ['    ' + variable for variable in variables])
+                        for line, variables in zip(trace, reversed(frame_locals) if self.reverse else frame_locals)
+                    ]
+
                 type_ = exc_type if isinstance(exc_type, str) else exc_type.__name__
                 tb_message = self.style['backtrace'].format(
                     'Traceback ({}):'.format('Most recent call ' + ('first' if self.reverse else 'last'))
@@ -185,6 +214,20 @@ class ColorizingStreamHandler(chromalog.ColorizingStreamHandler):
 
                 self.flush()
 
+    def emit_locals(self, tb):
+        frames = [frame for frame, _ in traceback.walk_tb(tb)]
+
+        for frame, variables in zip(frames, self.frame_locals.render(tb)):
+            if variables:
+                code = frame.f_code
+                self.stream.write('Locals of {} in {}:\n'.format(code.co_name, code.co_filename))
+                self.stream.write(''.join('    ' + variable + '\n' for variable in variables))
+
+        self.flush()
+
+
+handlers.STREAM_EMITS.add(ColorizingStreamHandler.emit)
+
 
 class _ColorizingStreamHandler:
     CONFIG = {}
@@ -196,13 +239,82 @@ class _ColorizingStreamHandler:
         return ColorizingStreamHandler(*args, **config)
 
 
+class WarningsAggregator(object):
+    """Display the first occurrence of a warning then periodic summaries of its occurrences.
+
+    The occurrences are counted by ``(category, filename, lineno)`` in a table
+    of at most ``max_entries`` entries, the least recently seen entry being
+    evicted first. The occurrences not yet displayed are summarized when their
+    entry is evicted and by ``flush()``, at exit.
+    """
+
+    def __init__(self, showwarning, period=60, max_entries=1000):
+        self.showwarning = showwarning
+        self.period = period
+        self.max_entries = max_entries
+
+        self.occurrences = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def summarize(self, key, occurrence):
+        nb, _, message, file, line = occurrence
+
+        category, filename, lineno = key
+        message = '{} [repeated {} times since last displayed]'.format(message, nb)
+        self.showwarning(message, category, filename, lineno, file, line)
+
+    def __call__(self, message, category, filename, lineno, file=None, line=None):
+        key = (category, filename, lineno)
+        now = time.monotonic()
+        evicted = summary = None
+
+        with self.lock:
+            occurrence = self.occurrences.get(key)
+            if occurrence is None:
+                if len(self.occurrences) >= self.max_entries:
+                    evicted = self.occurrences.popitem(last=False)
+
+                self.occurrences[key] = [0, now + self.period, message, file, line]
+            else:
+                self.occurrences.move_to_end(key)
+
+                occurrence[0] += 1
+                occurrence[2:] = message, file, line
+                if now >= occurrence[1]:
+                    summary = occurrence[:]
+                    occurrence[0], occurrence[1] = 0, now + self.period
+
+        if (evicted is not None) and evicted[1][0]:
+            self.summarize(*evicted)
+
+        if occurrence is None:
+            self.showwarning(message, category, filename, lineno, file, line)
+        elif summary is not None:
+            self.summarize(key, summary)
+
+    def flush(self):
+        """Display the summaries of the occurrences not yet displayed."""
+        with self.lock:
+            pending = [(key, occurrence[:]) for key, occurrence in self.occurrences.items() if occurrence[0]]
+            for occurrence in self.occurrences.values():
+                occurrence[0] = 0
+
+        for key, occurrence in pending:
+            self.summarize(key, occurrence)
+
+
 class DictConfigurator(logging.config.dictConfigClass):
+    BATCHING_PARAMS = {'batch_size': 'batch_size', 'batch_interval': 'flush_interval', 'batch_level': 'flush_level'}
+
     def __init__(self):
         pass
 
     def create_handler(self, args='()', **kw):
         cls = self.resolve(kw.pop('class'))
 
+        # Contention-reducing mode: the handler is wrapped into a `ThreadBufferedHandler`
+        batching = {name: kw.pop(param) for param, name in self.BATCHING_PARAMS.items() if param in kw}
+
         # Special case for handler which refers to another handler
         # (see `logging.config.DictConfigurator.configure_handler`)
         if issubclass(cls, logging.handlers.SMTPHandler) and ('mailhost' in kw):
@@ -214,7 +326,9 @@ class DictConfigurator(logging.config.dictConfigClass):
             if isinstance(address, (list, tuple)):
                 kw['address'] = (address[0], int(address[1]))
 
-        return cls(**kw) if kw else cls(*eval(args))  # noqa: S307
+        handler = cls(**kw) if kw else cls(*eval(args))  # noqa: S307
+
+        return handlers.ThreadBufferedHandler(handler, **batching) if batching else handler
 
     def configure(self, config):
         super(DictConfigurator, self).__init__(config)
@@ -242,12 +356,26 @@ class Logger(plugin.Plugin):
             }
         },
         warnings='string_list(default=list())',
+        warnings_aggregation={
+            'activated': 'boolean(default=False, help="display only the first occurrence of a warning then periodic summaries")',
+            'period': 'integer(default=60, help="number of seconds between two summaries of the same warning")',
+            'max_entries': 'integer(default=1000, help="maximum number of different warnings tracked")',
+        },
+        context='string_list(default=list(), help="contextual fields, set by ``nagare.log.set_context()``, added to every log record")',
         exceptions={
             'simplified': 'boolean(default=True, help="Don\'t display the first Nagare internal call frames")',
             'conservative': 'boolean(default=True, help="")',
             'reverse': 'boolean(default=False, help="Display the call frames in reverse order (last called frame fist)")',
             'align': 'boolean(default=True, help="align the fields of the call frames")',
             'keep_path': 'integer(default=2, help="number of last filename parts to display. ``0`` to display the whole filename")',
+            'locals': {
+                'activated': 'boolean(default=False, help="display the local variables of the innermost call frames")',
+                'frames': 'integer(default=1, help="number of innermost call frames to display the local variables of")',
+                'max_length': 'integer(default=200, help="maximum length of the representation of a value")',
+                'max_items': 'integer(default=10, help="maximum number of displayed items of a container")',
+                'budget': 'integer(default=4000, help="maximum total length of the local variables of an exception")',
+                'timeout': 'float(default=0.05, help="maximum time, in seconds, spent to render the local variables")',
+            },
         },
         logger={
             'propagate': 'boolean(default=True, help="propagate log messages to the parent logger")',
@@ -297,6 +425,8 @@ class Logger(plugin.Plugin):
         style,
         styles,
         warnings,
+        warnings_aggregation,
+        context,
         exceptions,
         logger,
         handler,
@@ -312,6 +442,10 @@ class Logger(plugin.Plugin):
 
         _ColorizingStreamHandler.CONFIG = {k: v for k, v in exceptions.items() if not isinstance(v, dict)}
 
+        frame_locals = dict(exceptions['locals'])
+        if frame_locals.pop('activated'):
+            _ColorizingStreamHandler.CONFIG['frame_locals'] = FrameLocals(**frame_locals)
+
         colors = (styles.get(style) or STYLES.get(style) or STYLES['nocolors']).copy()
         colors = {name: ''.join(COLORS.get(c.upper(), '') for c in color) for name, color in colors.items()}
         _ColorizingStreamHandler.CONFIG['colors'] = colors
@@ -331,6 +465,22 @@ class Logger(plugin.Plugin):
         )
         logging.captureWarnings(True)
 
+        showwarning = warnings_modules.showwarning
+        if isinstance(showwarning, WarningsAggregator):
+            showwarning.flush()
+            atexit.unregister(showwarning.flush)
+            showwarning = showwarning.showwarning
+
+        if warnings_aggregation['activated']:
+            showwarning = WarningsAggregator(
+                showwarning, warnings_aggregation['period'], warnings_aggregation['max_entries']
+            )
+            atexit.register(showwarning.flush)
+
+        warnings_modules.showwarning = showwarning
+
+        log.set_context_fields(context)
+
         configurator = DictConfigurator()
 
         logger_name = 'nagare.application.' + _app_name
@@ -386,6 +536,8 @@ class Logger(plugin.Plugin):
             style=style,
             styles=styles,
             warnings=warnings,
+            warnings_aggregation=warnings_aggregation,
+            context=context,
             exceptions=exceptions,
             loggers=loggers,
             handlers=handlers,
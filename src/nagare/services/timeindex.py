@@ -0,0 +1,258 @@
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+"""Sparse time index of the log files.
+
+The index is a ``<log file>.idx`` sidecar file of fixed size
+``(timestamp in microseconds, byte offset)`` entries, added every
+``every`` records or every ``interval`` seconds.
+"""
+
+import os
+import re
+import sys
+import time
+import bisect
+import struct
+import argparse
+import datetime
+
+from nagare.services import backtrace
+
+DESCRIPTION = """Display the lines of a log file logged in a time range.
+
+  `nagare-log-range --since '2024-05-02 10:00' --until '2024-05-02 10:05' app.log`
+"""
+
+ENTRY = struct.Struct('<qQ')
+
+TRACEBACK_IDENTIFIER = 'Traceback (most recent call last):'
+TRACEBACK_ENTRY = re.compile(r'\s+File "(.*)", line (\d+), in (.*)$')
+TRACEBACK_MARKERS = re.compile(r'\s*[\^~]+\s*$')
+
+# Directives of `time.strftime()` whose width depends on the date or the locale
+VARIABLE_WIDTH_DIRECTIVES = re.compile(r'%[aAbBcpxXzZ]')
+
+
+def index_filename(filename):
+    return filename + '.idx'
+
+
+class TimeIndex(object):
+    """Writer of the sidecar index of a log file.
+
+    Args:
+        filename: path of the log file
+        mode: opening mode of the log file
+        every: add an index entry every ``every`` records. ``0`` to disable
+        interval: add an index entry every ``interval`` seconds. ``0`` to disable
+    """
+
+    def __init__(self, filename, mode='a', every=0, interval=0):
+        self.filename = index_filename(filename)
+        self.mode = mode.replace('b', '') + 'b'
+        self.every = int(every) or float('inf')
+        self.interval = float(interval) or float('inf')
+
+        self.stream = None
+        self.count = 0
+        self.next_time = 0
+
+    def open(self):
+        self.stream = open(self.filename, self.mode, buffering=0)  # noqa: SIM115
+        self.count = 0
+        self.next_time = 0
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def due(self, record):
+        self.count += 1
+        return (self.count >= self.every) or (record.created >= self.next_time)
+
+    def add(self, record, offset):
+        if self.stream is None:
+            self.open()
+
+        self.stream.write(ENTRY.pack(int(record.created * 1000000), offset))
+        self.count = 0
+        self.next_time = record.created + self.interval
+
+
+def read_index(filename):
+    """Load the index of a log file.
+
+    Returns:
+        the list of the timestamps and the list of their offsets
+    """
+    timestamps = []
+    offsets = []
+
+    try:
+        with open(index_filename(filename), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return timestamps, offsets
+
+    for timestamp, offset in ENTRY.iter_unpack(data[: len(data) - (len(data) % ENTRY.size)]):
+        timestamps.append(timestamp / 1000000)
+        offsets.append(offset)
+
+    return timestamps, offsets
+
+
+def seek_range(filename, since=None, until=None):
+    """Find the part of a log file covering a time range.
+
+    Returns:
+        start offset and end offset (``None`` for end of file)
+    """
+    timestamps, offsets = read_index(filename)
+
+    start = 0
+    if (since is not None) and timestamps:
+        i = bisect.bisect_right(timestamps, since) - 1
+        start = offsets[i] if i >= 0 else 0
+
+    end = None
+    if until is not None:
+        i = bisect.bisect_right(timestamps, until)
+        end = offsets[i] if i < len(offsets) else None
+
+    return start, end
+
+
+def read_lines(filename, since=None, until=None, time_format='%Y-%m-%d %H:%M:%S', encoding='utf-8'):
+    """Stream the lines of a log file logged in a time range.
+
+    Only the part of the file found in the index is read. Lines without a
+    timestamp (tracebacks, multi-lines messages) follow their record.
+
+    The timestamps are parsed from the first characters of the lines so
+    ``time_format`` must produce fixed width dates (no month or day names).
+    """
+    start, end = seek_range(filename, since, until)
+    time_length = len(time.strftime(time_format))
+    since = float('-inf') if since is None else since
+    until = float('inf') if until is None else until
+
+    inside = True
+    with open(filename, 'rb') as f:
+        f.seek(start)
+
+        for line in f:
+            try:
+                timestamp = time.mktime(time.strptime(line[:time_length].decode(encoding), time_format))
+            except ValueError:
+                pass
+            else:
+                inside = (since < timestamp + 1) and (timestamp <= until)
+
+            if inside:
+                yield line.decode(encoding, 'replace').rstrip('\r\n')
+
+            start += len(line)
+            if (end is not None) and (start >= end):
+                break
+
+
+def beautify(lines):
+    """Render the tracebacks found in lines through the backtrace renderer.
+
+    A traceback truncated by the end of the range is displayed as is.
+    """
+    entries = raw_lines = None
+
+    for line in lines:
+        if line.strip() == TRACEBACK_IDENTIFIER:
+            if raw_lines:
+                yield from raw_lines
+
+            entries, raw_lines = [], [line]
+            continue
+
+        if entries is None:
+            yield line
+            continue
+
+        if line.startswith(' '):
+            raw_lines.append(line)
+
+            entry = TRACEBACK_ENTRY.match(line)
+            if entry:
+                entries.append([entry.group(1), entry.group(2), entry.group(3), '', None, None])
+            elif entries and not TRACEBACK_MARKERS.match(line):
+                entries[-1][3] = line.strip()
+            continue
+
+        styles = backtrace.CONVERVATIVE_STYLES
+        yield styles['backtrace'].format(TRACEBACK_IDENTIFIER)
+        for entry in backtrace._Hook(entries, align=True, conservative=True).generate_backtrace(styles):
+            yield entry.rstrip()
+        yield styles['error'].format(line) + backtrace.Style.RESET_ALL
+
+        entries = raw_lines = None
+
+    if raw_lines:
+        yield from raw_lines
+
+
+def parse_time(value):
+    """Parse a command line date, as ISO 8601 date or timestamp."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _parse_time_format(value):
+    if VARIABLE_WIDTH_DIRECTIVES.search(value.replace('%%', '')):
+        raise argparse.ArgumentTypeError('only fixed width time formats are supported')
+
+    return value
+
+
+def display_range(args):
+    for filename in args.files:
+        if not os.path.exists(index_filename(filename)):
+            sys.stderr.write('No index found for {}, scanning the whole file\n'.format(filename))
+
+        lines = read_lines(filename, args.since, args.until, args.time_format, args.encoding)
+        for line in beautify(lines) if args.beautify else lines:
+            sys.stdout.write(line + '\n')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('files', nargs='+', help='Indexed log files')
+    parser.add_argument('--since', type=parse_time, help='Start time, as ISO 8601 date or timestamp')
+    parser.add_argument('--until', type=parse_time, help='End time, as ISO 8601 date or timestamp')
+    parser.add_argument(
+        '-t',
+        '--time-format',
+        type=_parse_time_format,
+        default='%Y-%m-%d %H:%M:%S',
+        help='Fixed width format of the timestamp starting the records',
+    )
+    parser.add_argument('-e', '--encoding', default='utf-8', help='Encoding of the log files')
+    parser.add_argument('-b', '--beautify', action='store_true', help='Beautify the tracebacks')
+    parser.set_defaults(func=display_range)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# Encoding: utf-8
+
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+import sys
+import logging
+import argparse
+
+from nagare import log
+from nagare.services import binlog
+
+
+def create_record(msg, *args, exc_info=None):
+    logger = logging.getLogger('nagare.test')
+    return logger.makeRecord(logger.name, logging.INFO, __file__, 42, msg, args, exc_info, 'test')
+
+
+def read_records(filename):
+    with open(filename, 'rb') as stream:
+        return list(binlog.read_records(stream))
+
+
+def test_encode_args():
+    args = (None, True, False, 42, -(2**63), 3.5, 'été', b'\x00\xff')
+    encoded = binlog.encode_args(args)
+
+    assert binlog.decode_args(encoded, 0, len(args)) == (args, len(encoded))
+    assert binlog.encode_args((object(),)) is None
+    assert binlog.encode_args((2**63,)) is None
+
+
+def test_round_trip(tmp_path):
+    filename = str(tmp_path / 'app.blog')
+
+    handler = binlog.BinaryFileHandler(filename)
+    handler.handle(create_record('Hello %s, %d %.1f', 'world', 42, 3.5))
+    handler.handle(create_record('Already formatted'))
+    handler.handle(create_record('%r', object))
+    handler.close()
+
+    records = read_records(filename)
+    assert [record.getMessage() for record in records] == [
+        'Hello world, 42 3.5',
+        'Already formatted',
+        "<class 'object'>",
+    ]
+
+    record = records[0]
+    assert record.msg == 'Hello %s, %d %.1f'
+    assert record.args == ('world', 42, 3.5)
+    assert (record.name, record.levelname, record.levelno) == ('nagare.test', 'INFO', logging.INFO)
+    assert (record.pathname, record.lineno, record.funcName) == (__file__, 42, 'test')
+
+
+def test_exception(tmp_path):
+    filename = str(tmp_path / 'app.blog')
+
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        record = create_record('Error', exc_info=sys.exc_info())
+
+    handler = binlog.BinaryFileHandler(filename)
+    handler.handle(record)
+    handler.close()
+
+    (record,) = read_records(filename)
+    assert record.exc_text.startswith('Traceback (most recent call last):')
+    assert record.exc_text.endswith('ValueError: boom')
+
+
+def test_context_fields(tmp_path):
+    filename = str(tmp_path / 'app.blog')
+
+    log.set_context_fields(['request_id', 'user'])
+    try:
+        handler = binlog.BinaryFileHandler(filename)
+
+        tokens = log.set_context(request_id='abc', user='john')
+        try:
+            handler.handle(create_record('In request'))
+        finally:
+            log.reset_context(tokens)
+
+        handler.handle(create_record('Out of request'))
+        handler.close()
+    finally:
+        log.set_context_fields([])
+
+    record1, record2 = read_records(filename)
+    assert (record1.request_id, record1.user) == ('abc', 'john')
+    assert (record2.request_id, record2.user) == (log.CONTEXT_DEFAULT, log.CONTEXT_DEFAULT)
+
+
+def test_reopen(tmp_path):
+    filename = str(tmp_path / 'app.blog')
+
+    for i in range(3):
+        handler = binlog.BinaryFileHandler(filename)
+        handler.handle(create_record('Run %d', i))
+        handler.handle(create_record('Run %d again', i))
+        handler.close()
+
+    assert [record.getMessage() for record in read_records(filename)] == [
+        'Run 0',
+        'Run 0 again',
+        'Run 1',
+        'Run 1 again',
+        'Run 2',
+        'Run 2 again',
+    ]
+
+
+def test_bounded_strings(tmp_path):
+    filename = str(tmp_path / 'app.blog')
+
+    handler = binlog.BinaryFileHandler(filename, max_strings=20)
+    for i in range(100):
+        handler.handle(create_record('Formatted message {}'.format(i)))
+        handler.handle(create_record('Message %d' + ' ' * i, i))
+
+        assert len(handler.strings) <= 20 + 5
+    handler.close()
+
+    messages = [record.getMessage() for record in read_records(filename)]
+    assert messages[::2] == ['Formatted message {}'.format(i) for i in range(100)]
+    assert messages[1::2] == ['Message {}'.format(i) + ' ' * i for i in range(100)]
+
+
+def test_decode_missing_context_fields(tmp_path, capsys):
+    filename = str(tmp_path / 'app.blog')
+
+    handler = binlog.BinaryFileHandler(filename)
+    handler.handle(create_record('Before the declaration'))
+    handler.close()
+
+    args = argparse.Namespace(
+        files=[filename],
+        level=0,
+        loggers=[],
+        since=None,
+        until=None,
+        format='%(request_id)s %(levelname)s %(message)s',
+        style='nocolors',
+    )
+    binlog.decode(args)
+
+    assert capsys.readouterr().out == '- INFO Before the declaration\n'
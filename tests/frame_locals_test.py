@@ -0,0 +1,64 @@
+# Encoding: utf-8
+
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+import sys
+
+from nagare.services.frame_locals import BoundedRepr, FrameLocals
+
+
+class Query(object):
+    def __repr__(self):
+        raise AssertionError('Arbitrary `__repr__` called')
+
+
+def test_bounded_repr():
+    r = BoundedRepr(max_length=40, max_items=3).repr
+
+    assert r('x' * 100) == "'" + 'x' * 17 + '...' + 'x' * 18 + "'"
+    assert r([1, 2, 3, 4]) == '[1, 2, 3, ...]'
+    assert r({'b': 1, 'a': 2, 'c': 3, 'd': 4}) == "{'b': 1, 'a': 2, 'c': 3, ...}"
+    assert r({}) == '{}'
+    assert r(set()) == 'set()'
+    assert r(frozenset()) == 'frozenset()'
+    assert r(Query()).startswith('<{}.Query'.format(__name__))
+
+
+def test_bytes():
+    r = BoundedRepr(max_length=40).repr
+
+    assert r(b'x' * 10) == "b'xxxxxxxxxx'"
+    assert r(b'x' * 100000000) == "b'" + 'x' * 16 + '...' + 'x' * 18 + "'"
+    assert r(bytearray(100000000)).startswith("bytearray(b'\\x00")
+
+
+def test_huge_containers():
+    r = BoundedRepr(max_size=1000).repr
+
+    assert r(set(range(1001))) == '<set of 1001 items>'
+    assert r(dict.fromkeys(range(1001))) == '<dict of 1001 items>'
+    assert r(set(range(1000))).startswith('{')
+
+
+def test_render():
+    def f(query, items):
+        a = 42  # noqa: F841
+        raise ValueError()
+
+    try:
+        f(Query(), set(range(50000)))
+    except ValueError:
+        tb = sys.exc_info()[2]
+
+    lines = FrameLocals(frames=1).render(tb)
+
+    assert lines[0] == []
+    assert lines[1][0].startswith('query = <{}.Query object at 0x'.format(__name__))
+    assert lines[1][1:] == ['items = {0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ...}', 'a = 42']
@@ -0,0 +1,177 @@
+# Encoding: utf-8
+
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+import io
+import os
+import logging
+import threading
+
+import pytest
+
+from nagare.services import binlog, handlers
+from nagare.services.logging import CATEGORIES, ColorizingStreamHandler
+
+
+def create_logger(name, *log_handlers):
+    logger = logging.getLogger('nagare.test.' + name)
+    logger.handlers = list(log_handlers)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+
+    return logger
+
+
+def test_buffered_order(tmp_path):
+    filename = str(tmp_path / 'app.log')
+
+    handler = handlers.ThreadBufferedHandler(logging.FileHandler(filename), batch_size=8)
+    logger = create_logger('order', handler)
+
+    def log(i):
+        for j in range(1000):
+            logger.info('%d %d', i, j)
+
+    threads = [threading.Thread(target=log, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    handler.close()
+
+    with open(filename) as f:
+        records = [tuple(map(int, line.split())) for line in f]
+
+    assert len(records) == 4000
+    for i in range(4):
+        assert [j for thread, j in records if thread == i] == list(range(1000))
+
+
+def test_buffered_prepared_records(tmp_path):
+    filename = str(tmp_path / 'app.log')
+    blog_filename = str(tmp_path / 'app.blog')
+
+    handler = handlers.ThreadBufferedHandler(handlers.FileHandler(filename))
+    blog_handler = handlers.ThreadBufferedHandler(binlog.BinaryFileHandler(blog_filename))
+    logger = create_logger('prepared', handler, blog_handler)
+
+    data = [1]
+    logger.info('Data %s', data)
+    data.append(2)
+    logger.info('Number %d', 42)
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logger.exception('Error')
+    handler.close()
+    blog_handler.close()
+
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    assert lines[:3] == ['Data [1]', 'Number 42', 'Error']
+    assert lines[-1] == 'ValueError: boom'
+
+    with open(blog_filename, 'rb') as f:
+        records = list(binlog.read_records(f))
+    assert [(record.msg, record.args) for record in records] == [
+        ('%s', ('Data [1]',)),
+        ('Number %d', (42,)),
+        ('%s', ('Error',)),
+    ]
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork() not available')
+def test_buffered_fork(tmp_path):
+    filename = str(tmp_path / 'app.log')
+
+    handler = handlers.ThreadBufferedHandler(logging.FileHandler(filename), batch_size=4)
+    logger = create_logger('fork', handler)
+    logger.info('Parent')
+
+    pid = os.fork()
+    if not pid:
+        for i in range(10):
+            logger.info('Child %d', i)
+        handler.close()
+        os._exit(0)
+
+    os.waitpid(pid, 0)
+    handler.close()
+
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    assert lines.count('Parent') == 1
+    assert [line for line in lines if line.startswith('Child')] == ['Child {}'.format(i) for i in range(10)]
+
+
+def test_buffered_flush(tmp_path):
+    filename = str(tmp_path / 'app.log')
+
+    handler = handlers.ThreadBufferedHandler(logging.FileHandler(filename), batch_size=1000, flush_interval=60)
+    logger = create_logger('flush', handler)
+    for i in range(100):
+        logger.info('Record %d', i)
+
+    handler.flush()
+    with open(filename) as f:
+        assert len(f.read().splitlines()) == 100
+
+    handler.close()
+
+
+class Tty(io.StringIO):
+    def isatty(self):
+        return True
+
+
+class Mutating(logging.Handler):
+    def emit(self, record):
+        record.msg = 'Changed'
+        record.args = record.exc_info = record.exc_text = None
+
+
+@pytest.mark.parametrize('target', [logging.FileHandler, handlers.FileHandler])
+def test_buffered_record_changed_by_later_handler(tmp_path, target):
+    filename = str(tmp_path / 'app.log')
+
+    handler = handlers.ThreadBufferedHandler(target(filename))
+    logger = create_logger('changed', handler, Mutating())
+
+    logger.info('Unchanged')
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logger.exception('Error')
+    handler.close()
+
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    assert lines[:2] == ['Unchanged', 'Error']
+    assert lines[-1] == 'ValueError: boom'
+
+
+def test_colorizing_handler_keeps_exception(tmp_path):
+    filename = str(tmp_path / 'app.log')
+
+    colorizing = ColorizingStreamHandler(Tty(), dict.fromkeys(CATEGORIES[1], ''))
+    handler = handlers.ThreadBufferedHandler(logging.FileHandler(filename))
+    logger = create_logger('colorizing', handler, colorizing)
+
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logger.exception('Error')
+    handler.close()
+
+    assert 'ValueError' in colorizing.stream.getvalue()
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == 'Error'
+    assert lines[-1] == 'ValueError: boom'
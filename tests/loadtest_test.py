@@ -0,0 +1,211 @@
+# Encoding: utf-8
+
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+import socket
+import logging
+import argparse
+
+import pytest
+
+from nagare.services import loadtest
+
+
+def substitute(handlers, directory):
+    config = {'handler': {}, 'handlers': handlers}
+    sinks = loadtest.substitute_destinations(config, str(directory))
+
+    return config['handlers'], sinks
+
+
+def test_substitute_stream(tmp_path):
+    handlers, sinks = substitute(
+        {
+            'console': {'class': 'logging.StreamHandler', 'args': '(sys.stderr,)'},
+            'nagare': {'class': 'nagare.logging.StreamHandler', 'level': 'INFO'},
+        },
+        tmp_path,
+    )
+    try:
+        assert 'args' not in handlers['console']
+        assert handlers['console']['stream'].name == str(tmp_path / 'console.log')
+        assert handlers['nagare']['stream'].name == str(tmp_path / 'nagare.log')
+        assert handlers['nagare']['level'] == 'INFO'
+
+        assert {id(handler['stream']) for handler in handlers.values()} == {id(sink) for sink in sinks}
+    finally:
+        for sink in sinks:
+            sink.close()
+
+
+def test_substitute_file(tmp_path):
+    handlers, sinks = substitute(
+        {
+            'file': {'class': 'logging.FileHandler', 'args': "('/var/log/app.log', 'a')"},
+            'rotating': {'class': 'nagare.logging.CompressingRotatingFileHandler', 'filename': '/var/log/rot.log'},
+            'binary': {'class': 'nagare.logging.BinaryFileHandler', 'filename': '/var/log/app.blog'},
+        },
+        tmp_path,
+    )
+
+    assert sinks == []
+    assert handlers['file'] == {'class': 'logging.FileHandler', 'filename': str(tmp_path / 'app.log'), 'mode': 'a'}
+    assert handlers['rotating']['filename'] == str(tmp_path / 'rot.log')
+    assert handlers['binary']['filename'] == str(tmp_path / 'app.blog')
+
+
+@pytest.mark.parametrize(
+    'handler, socktype',
+    [
+        ({'class': 'logging.handlers.SocketHandler', 'host': 'logs.example.com', 'port': '9020'}, socket.SOCK_STREAM),
+        ({'class': 'logging.handlers.DatagramHandler', 'args': "('logs.example.com', 9021)"}, socket.SOCK_DGRAM),
+    ],
+)
+def test_substitute_socket(tmp_path, handler, socktype):
+    handlers, sinks = substitute({'socket': handler}, tmp_path)
+    try:
+        (sink,) = sinks
+        assert sink.socket.type == socktype
+        assert (handlers['socket']['host'], handlers['socket']['port']) == sink.address
+    finally:
+        sinks[0].close()
+
+
+def test_substitute_syslog(tmp_path):
+    handlers, sinks = substitute(
+        {
+            'syslog': {'class': 'logging.handlers.SysLogHandler', 'address': '/dev/log'},
+            'tcp_syslog': {'class': 'logging.handlers.SysLogHandler', 'socktype': str(int(socket.SOCK_STREAM))},
+        },
+        tmp_path,
+    )
+    try:
+        syslog, tcp_syslog = sinks
+        assert syslog.socket.type == socket.SOCK_DGRAM
+        assert handlers['syslog']['address'] == syslog.address
+        assert tcp_syslog.socket.type == socket.SOCK_STREAM
+        assert handlers['tcp_syslog']['address'] == tcp_syslog.address
+    finally:
+        for sink in sinks:
+            sink.close()
+
+
+def test_substitute_network(tmp_path):
+    handlers, sinks = substitute(
+        {
+            'smtp': {
+                'class': 'logging.handlers.SMTPHandler',
+                'args': "('mail.example.com', 'app@example.com', ['ops@example.com'], 'Error')",
+                'level': 'ERROR',
+                'formatter': 'simple',
+                'batch_size': '16',
+            },
+            'http': {
+                'class': 'logging.handlers.HTTPHandler',
+                'host': 'logs.example.com',
+                'url': '/log',
+                'batch_interval': '0.5',
+            },
+        },
+        tmp_path,
+    )
+
+    assert sinks == []
+    assert handlers['smtp'] == {
+        'class': 'logging.FileHandler',
+        'filename': str(tmp_path / 'smtp.log'),
+        'level': 'ERROR',
+        'formatter': 'simple',
+        'batch_size': '16',
+    }
+    assert handlers['http'] == {
+        'class': 'logging.FileHandler',
+        'filename': str(tmp_path / 'http.log'),
+        'batch_interval': '0.5',
+    }
+
+
+def test_load_config(tmp_path):
+    filename = str(tmp_path / 'app.cfg')
+    with open(filename, 'w') as f:
+        f.write('[logging]\nstyle = dark\n[[warnings_aggregation]]\nperiod = 10\n')
+
+    config = loadtest.load_config(filename, 'logging', 'myapp')
+    assert config['_app_name'] == 'myapp'
+    assert config['style'] == 'dark'
+    assert config['warnings_aggregation'] == {'activated': False, 'period': 10, 'max_entries': 1000}
+
+
+def test_load_config_errors(tmp_path):
+    filename = str(tmp_path / 'app.cfg')
+    with open(filename, 'w') as f:
+        f.write('[logging]\n[[warnings_aggregation]]\nactivated = maybe\nperiod = often\n')
+
+    with pytest.raises(loadtest.ConfigurationError) as e:
+        loadtest.load_config(filename, 'logging', 'myapp')
+
+    message = str(e.value).splitlines()
+    assert message[0] == 'Invalid configuration of {}:'.format(filename)
+    assert sorted(line.split(':')[0] for line in message[1:]) == [
+        '  [warnings_aggregation] activated',
+        '  [warnings_aggregation] period',
+    ]
+
+
+def test_percentile():
+    latencies = list(range(1, 1001))
+
+    assert loadtest.percentile(latencies, 50) == 501
+    assert loadtest.percentile(latencies, 99) == 991
+    assert loadtest.percentile(latencies, 99.9) == 1000
+    assert loadtest.percentile(latencies, 100) == 1000
+    assert loadtest.percentile([42], 99.9) == 42
+    assert loadtest.percentile([], 50) == 0
+
+
+def test_sink():
+    sink = loadtest.Sink()
+    try:
+        with socket.create_connection(sink.address) as s:
+            s.sendall(b'x' * 100000)
+    finally:
+        sink.close()
+
+
+def test_load_test_processes(tmp_path, capsys):
+    filename = str(tmp_path / 'app.cfg')
+    with open(filename, 'w') as f:
+        f.write(
+            '[logging]\n[[logger]]\nlevel = INFO\nhandlers = app,\n'
+            '[[handlers]]\n[[[app]]]\nclass = logging.StreamHandler\nargs = "(sys.stderr,)"\n'
+        )
+
+    args = argparse.Namespace(
+        config=filename,
+        section='logging',
+        app_name='app',
+        threads=2,
+        processes=3,
+        records=100,
+        levels=[(logging.INFO, 1)],
+        sizes=[32],
+        exceptions=0.1,
+        substitute=True,
+        directory=str(tmp_path / 'stand-ins'),
+        memory=False,
+    )
+    try:
+        loadtest.load_test(args)
+    finally:
+        logging.getLogger().handlers = []
+
+    assert 'Records: 600\n' in capsys.readouterr().out
+    with open(str(tmp_path / 'stand-ins' / 'app.log')) as f:
+        assert sum(line.startswith('Load test record') for line in f) == 600
@@ -0,0 +1,108 @@
+# Encoding: utf-8
+
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+import logging
+
+import pytest
+
+from nagare import log
+
+
+class Records(logging.Handler):
+    def __init__(self):
+        super(Records, self).__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records():
+    handler = Records()
+
+    logger = logging.getLogger('nagare.test.log')
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    log.set_context_fields(['request_id', 'user'])
+    yield logger, handler.records
+    log.set_context_fields([])
+
+
+def test_context_fields(records):
+    logger, records = records
+
+    tokens = log.set_context(request_id='abc', user='john')
+    try:
+        logger.info('In request')
+        assert log.get_context() == {'request_id': 'abc', 'user': 'john'}
+    finally:
+        log.reset_context(tokens)
+
+    logger.info('Out of request')
+
+    assert [(record.request_id, record.user) for record in records] == [
+        ('abc', 'john'),
+        (log.CONTEXT_DEFAULT, log.CONTEXT_DEFAULT),
+    ]
+
+
+def test_context_fields_extra(records):
+    logger, records = records
+
+    tokens = log.set_context(request_id='abc', user='john')
+    try:
+        logger.info('Extra', extra={'request_id': 'xyz'})
+        logging.LoggerAdapter(logger, {'user': 'jane'}).info('Adapter')
+    finally:
+        log.reset_context(tokens)
+
+    assert [(record.request_id, record.user) for record in records] == [('xyz', 'john'), ('abc', 'jane')]
+
+
+def test_no_context_fields():
+    log.set_context_fields([])
+
+    assert logging.Logger.makeRecord is log._logger_make_record
+
+
+def test_override_level(records):
+    logger, records = records
+    logger.handlers[0].setLevel(logging.WARNING)
+
+    logger.debug('Filtered')
+    with log.override_level(logging.DEBUG):
+        assert logging.Logger.isEnabledFor is log._overridden_is_enabled_for
+        logger.debug('Overridden')
+        logger.info('Overridden')
+    logger.info('Filtered')
+
+    assert logging.Logger.isEnabledFor is log._is_enabled_for
+    assert [(record.levelname, record.msg) for record in records] == [('DEBUG', 'Overridden'), ('INFO', 'Overridden')]
+
+
+def test_context_fields_received_records(records):
+    tokens = log.set_context(request_id='abc')
+    try:
+        record = logging.makeLogRecord({'msg': 'Received', 'user': 'john'})
+    finally:
+        log.reset_context(tokens)
+
+    assert (record.request_id, record.user) == ('abc', 'john')
+
+
+def test_context_fields_extra_overwrite(records):
+    logger, records = records
+
+    with pytest.raises(KeyError):
+        logger.info('Extra', extra={'msg': 'Overwritten'})
@@ -0,0 +1,135 @@
+# Encoding: utf-8
+
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+import os
+import gzip
+import time
+import logging
+import importlib
+
+import pytest
+
+from nagare.services import handlers
+
+
+def create_record(msg, created=None):
+    record = logging.makeLogRecord({'msg': msg})
+    if created is not None:
+        record.created = created
+
+    return record
+
+
+def rotated_files(directory):
+    return sorted(filename for filename in os.listdir(str(directory)) if filename != 'app.log')
+
+
+def test_size_in_bytes(tmp_path):
+    filename = str(tmp_path / 'app.log')
+
+    handler = handlers.CompressingRotatingFileHandler(
+        filename, max_bytes='1000', compression='', encoding='utf-8', delay='False'
+    )
+    assert handler.stream is not None
+
+    for _ in range(100):
+        handler.handle(create_record('é' * 50))
+    handler.close()
+
+    sizes = [os.path.getsize(str(tmp_path / name)) for name in os.listdir(str(tmp_path))]
+    assert len(sizes) > 10
+    assert max(sizes) <= 1000
+
+
+def test_delay(tmp_path):
+    handler = handlers.CompressingRotatingFileHandler(str(tmp_path / 'app.log'), delay='true')
+    assert handler.stream is None
+    handler.close()
+
+
+def test_compression(tmp_path):
+    filename = str(tmp_path / 'app.log')
+
+    handler = handlers.CompressingRotatingFileHandler(filename, max_bytes=100, max_jobs=2)
+    for i in range(10):
+        handler.handle(create_record('Record {} {}'.format(i, 'x' * 80)))
+    handler.close()
+
+    files = rotated_files(tmp_path)
+    assert len(files) == 9
+    assert all(filename.endswith('.gz') for filename in files)
+
+    records = []
+    for filename in files:
+        with gzip.open(str(tmp_path / filename), 'rt') as f:
+            records.extend(f.read().splitlines())
+
+    assert sorted(records) == sorted('Record {} {}'.format(i, 'x' * 80) for i in range(9))
+
+
+def test_purge(tmp_path):
+    filename = str(tmp_path / 'app.log')
+
+    handler = handlers.CompressingRotatingFileHandler(filename, max_bytes=100, backup_count=3)
+    for i in range(10):
+        handler.handle(create_record('Record {} {}'.format(i, 'x' * 80)))
+    handler.close()
+
+    records = []
+    for filename in rotated_files(tmp_path):
+        with gzip.open(str(tmp_path / filename), 'rt') as f:
+            records.extend(line.split()[1] for line in f)
+
+    assert sorted(records) == ['6', '7', '8']
+
+
+def test_purge_uncompressed(tmp_path):
+    filename = str(tmp_path / 'app.log')
+
+    handler = handlers.CompressingRotatingFileHandler(filename, max_bytes=100, backup_count=2, compression='')
+    for i in range(10):
+        handler.handle(create_record('Record {} {}'.format(i, 'x' * 80)))
+    handler.close()
+
+    assert len(rotated_files(tmp_path)) == 2
+
+
+def test_interval(tmp_path):
+    filename = str(tmp_path / 'app.log')
+    now = time.time()
+
+    handler = handlers.CompressingRotatingFileHandler(filename, interval=3600, compression='')
+    handler.handle(create_record('Record 1', now))
+    handler.handle(create_record('Record 2', now))
+    handler.handle(create_record('Record 3', now + 3600))
+    handler.close()
+
+    (rotated,) = rotated_files(tmp_path)
+    with open(str(tmp_path / rotated)) as f:
+        assert f.read().splitlines() == ['Record 1', 'Record 2']
+
+    with open(filename) as f:
+        assert f.read().splitlines() == ['Record 3']
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        handlers.CompressingRotatingFileHandler(str(tmp_path / 'app.log'), compression='zip')
+
+
+def test_missing_compression_module(tmp_path):
+    try:
+        importlib.import_module('zstandard')
+    except ImportError:
+        with pytest.raises(ImportError, match='zstandard'):
+            handlers.CompressingRotatingFileHandler(str(tmp_path / 'app.log'), compression='zstd')
+    else:
+        pytest.skip('`zstandard` is installed')
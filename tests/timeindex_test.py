@@ -0,0 +1,76 @@
+# Encoding: utf-8
+
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+import time
+import logging
+import argparse
+
+import pytest
+
+from nagare.services import handlers, timeindex
+
+TRACEBACK = [
+    '2024-05-02 10:00:00 Error',
+    'Traceback (most recent call last):',
+    '  File "app.py", line 5, in <module>',
+    '    1 / 0',
+    'ZeroDivisionError: division by zero',
+]
+
+
+def test_read_range(tmp_path):
+    filename = str(tmp_path / 'app.log')
+    t0 = time.mktime((2024, 5, 2, 10, 0, 0, 0, 0, -1))
+
+    handler = handlers.FileHandler(filename, index_every=10)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s', '%Y-%m-%d %H:%M:%S'))
+    for i in range(100):
+        handler.handle(logging.makeLogRecord({'msg': 'Record {}'.format(i), 'created': t0 + i}))
+    handler.close()
+
+    timestamps, offsets = timeindex.read_index(filename)
+    assert timestamps == [t0 + i for i in range(0, 100, 10)]
+
+    start, end = timeindex.seek_range(filename, t0 + 35, t0 + 52)
+    assert (start, end) == (offsets[3], offsets[6])
+
+    lines = timeindex.read_lines(filename, t0 + 35, t0 + 52)
+    assert [line.split(' ', 2)[2] for line in lines] == ['Record {}'.format(i) for i in range(35, 53)]
+
+
+def test_beautify():
+    lines = list(timeindex.beautify(TRACEBACK))
+
+    assert lines[0] == TRACEBACK[0]
+    assert TRACEBACK[1] in lines[1]
+    assert TRACEBACK[-1] in lines[-1]
+
+
+def test_beautify_truncated():
+    assert list(timeindex.beautify(TRACEBACK[:-1])) == TRACEBACK[:-1]
+    assert list(timeindex.beautify(TRACEBACK[:2])) == TRACEBACK[:2]
+
+
+def test_parse_time():
+    t0 = time.mktime((2024, 5, 2, 10, 0, 0, 0, 0, -1))
+
+    assert timeindex.parse_time('2024-05-02 10:00') == t0
+    assert timeindex.parse_time('2024-05-02T10:00:00') == t0
+    assert timeindex.parse_time(str(t0)) == t0
+
+
+def test_time_format():
+    assert timeindex._parse_time_format('%Y-%m-%d %H:%M:%S') == '%Y-%m-%d %H:%M:%S'
+    assert timeindex._parse_time_format('%d %%B') == '%d %%B'
+
+    for time_format in ('%d %B %Y', '%a %H:%M', '%x'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            timeindex._parse_time_format(time_format)
@@ -0,0 +1,63 @@
+# Encoding: utf-8
+
+# --
+# Copyright (c) 2008-2024 Net-ng.
+# All rights reserved.
+#
+# This software is licensed under the BSD License, as described in
+# the file LICENSE.txt, which you should have received as part of
+# this distribution.
+# --
+
+from nagare.services.logging import WarningsAggregator
+
+
+def create_aggregator(period=60, max_entries=1000):
+    displayed = []
+
+    def showwarning(message, category, filename, lineno, file=None, line=None):
+        displayed.append((message, lineno))
+
+    aggregator = WarningsAggregator(showwarning, period, max_entries)
+
+    return aggregator, lambda lineno: aggregator('Warning', UserWarning, 'app.py', lineno), displayed
+
+
+def test_summaries():
+    aggregator, warn, displayed = create_aggregator(period=0)
+
+    warn(1)
+    warn(1)
+    warn(1)
+    assert displayed == [
+        ('Warning', 1),
+        ('Warning [repeated 1 times since last displayed]', 1),
+        ('Warning [repeated 1 times since last displayed]', 1),
+    ]
+
+
+def test_flush():
+    aggregator, warn, displayed = create_aggregator()
+
+    for _ in range(5):
+        warn(1)
+    warn(2)
+
+    aggregator.flush()
+    aggregator.flush()
+    assert displayed == [('Warning', 1), ('Warning', 2), ('Warning [repeated 4 times since last displayed]', 1)]
+
+
+def test_lru_eviction():
+    aggregator, warn, displayed = create_aggregator(max_entries=2)
+
+    warn(1)
+    warn(2)
+    warn(1)
+    warn(3)  # Evicts the entry of the line 2, least recently seen
+    warn(1)
+    assert displayed == [('Warning', 1), ('Warning', 2), ('Warning', 3)]
+
+    warn(4)  # Evicts the entry of the line 3, the pending occurrences of the line 1 are kept
+    warn(2)  # Evicts the entry of the line 1, its pending occurrences are displayed
+    assert displayed[3:] == [('Warning', 4), ('Warning [repeated 2 times since last displayed]', 1), ('Warning', 2)]